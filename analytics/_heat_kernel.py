@@ -0,0 +1,53 @@
+from __future__ import annotations
+import numpy as np
+from numba import njit
+
+# Every fast-math flag except nnan/ninf: the kernel relies on NaN checks to
+# skip missing components, which LLVM may drop if told NaNs can't occur.
+FASTMATH_FLAGS = {"nsz", "arcp", "contract", "afn", "reassoc"}
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS)
+def _heat_kernel(
+    pct14: np.ndarray,
+    pct30: np.ndarray,
+    dom: np.ndarray,
+    supply: np.ndarray,
+    z90: np.ndarray,
+    ebay: np.ndarray,
+    weights: np.ndarray,
+) -> np.ndarray:
+    """Weighted heat score per row, skipping NaN components.
+
+    Fused scalar loop over the metric columns; see ``analytics.metrics.heat_score``
+    for the formula. Weights are given in argument order.
+
+    Returns:
+        float64 array of heat scores
+    """
+    n = pct14.shape[0]
+    out = np.empty(n, dtype=np.float64)
+    for i in range(n):
+        acc = 0.0
+        # Price momentum, DOM and supply components (weighted by 10% normalization)
+        v = pct14[i]
+        if not np.isnan(v):
+            acc += weights[0] * (v / 10.0)
+        v = pct30[i]
+        if not np.isnan(v):
+            acc += weights[1] * (v / 10.0)
+        v = dom[i]
+        if not np.isnan(v):
+            acc += weights[2] * (v / 10.0)
+        v = supply[i]
+        if not np.isnan(v):
+            acc += weights[3] * (v / 10.0)
+        # Z90 capped at 3.0 and normalized to [0, 1]
+        v = z90[i]
+        if not np.isnan(v):
+            acc += weights[4] * (min(max(v, 0.0), 3.0) / 3.0)
+        # eBay momentum clamped to [-1, 1]
+        v = ebay[i]
+        if not np.isnan(v):
+            acc += weights[5] * min(max(v, -1.0), 1.0)
+        out[i] = acc
+    return out
@@ -2,22 +2,68 @@ from __future__ import annotations
 import pandas as pd
 import numpy as np
 import logging
+from numba import njit, prange
+
+from ._heat_kernel import _heat_kernel
 
 logger = logging.getLogger(__name__)
 
-def pct_change(s: pd.Series, periods: int) -> pd.Series:
-    """Calculate percentage change over specified periods.
+@njit(cache=True)
+def _rolling_z(x: np.ndarray, w: int) -> np.ndarray:
+    """Rolling z-score over a single group's values in one pass.
+    
+    Matches ``rolling(w, min_periods=1)`` mean/std (ddof=1) semantics: NaNs are
+    skipped, windows with fewer than two values or zero spread yield NaN, and
+    series shorter than the window are all NaN. Mean and M2 are maintained with
+    Welford add/remove updates as values enter and leave the window.
     
     Args:
-        s: Series of values
-        periods: Number of periods to look back
+        x: Contiguous float array for one (brand, reference) group
+        w: Window size
         
     Returns:
-        Series of percentage changes (multiplied by 100)
+        Array of z-scores (NaN where undefined)
     """
-    if len(s) < periods + 1:
-        return pd.Series([pd.NA] * len(s), index=s.index)
-    return s.pct_change(periods=periods) * 100.0
+    n = x.shape[0]
+    out = np.full_like(x, np.nan)
+    if n < w:
+        return out
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    # Length of the run of identical values ending at the newest value; a
+    # window made up entirely of that run has exactly zero spread.
+    same_run = 0
+    prev = np.nan
+    for i in range(n):
+        v = x[i]
+        if not np.isnan(v):
+            count += 1
+            delta = v - mean
+            mean += delta / count
+            m2 += delta * (v - mean)
+            if v == prev:
+                same_run += 1
+            else:
+                same_run = 1
+            prev = v
+        
+        j = i - w
+        if j >= 0 and not np.isnan(x[j]):
+            count -= 1
+            if count == 0:
+                mean = 0.0
+                m2 = 0.0
+            else:
+                delta = x[j] - mean
+                mean -= delta / count
+                m2 -= delta * (x[j] - mean)
+        
+        if np.isnan(v) or count < 2 or same_run >= count or m2 <= 0.0:
+            continue
+        std = np.sqrt(m2 / (count - 1))
+        out[i] = (v - mean) / std
+    return out
 
 def rolling_zscore(series: pd.Series, window: int) -> pd.Series:
     """Calculate rolling z-score over a window.
@@ -29,15 +75,104 @@ def rolling_zscore(series: pd.Series, window: int) -> pd.Series:
     Returns:
         Series of z-scores
     """
-    if len(series) < window:
-        return pd.Series([pd.NA] * len(series), index=series.index)
-    
-    m = series.rolling(window, min_periods=1).mean()
-    s = series.rolling(window, min_periods=1).std()
-    # Avoid division by zero
-    s = s.replace(0, pd.NA)
-    z = (series - m) / s
-    return z
+    x = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64)
+    return pd.Series(_rolling_z(x, window), index=series.index)
+
+@njit(cache=True)
+def _norm30(arr: np.ndarray) -> np.ndarray:
+    """Normalized 30-day momentum over a single group's values.
+    
+    For each full 30-value window, returns (last - first) / (max - min) over
+    the non-NaN values, or NaN when the window has fewer than two values or a
+    flat range. Rolling min/max are tracked with monotonic index deques so the
+    pass is O(n) rather than O(n * window).
+    
+    Args:
+        arr: Contiguous float array for one (brand, reference) group
+        
+    Returns:
+        Array of normalized momentum values (NaN where undefined)
+    """
+    w = 30
+    n = arr.shape[0]
+    out = np.full_like(arr, np.nan)
+    # Indices only ever move forward, so plain arrays with head/tail
+    # pointers are enough to act as deques.
+    max_q = np.empty(n, dtype=np.int64)
+    min_q = np.empty(n, dtype=np.int64)
+    max_head = 0
+    max_tail = 0
+    min_head = 0
+    min_tail = 0
+    first_valid = 0
+    last_valid = -1
+    count = 0
+    for i in range(n):
+        x = arr[i]
+        if not np.isnan(x):
+            while max_tail > max_head and arr[max_q[max_tail - 1]] <= x:
+                max_tail -= 1
+            max_q[max_tail] = i
+            max_tail += 1
+            while min_tail > min_head and arr[min_q[min_tail - 1]] >= x:
+                min_tail -= 1
+            min_q[min_tail] = i
+            min_tail += 1
+            last_valid = i
+            count += 1
+        
+        start = i - w + 1
+        if start > 0 and not np.isnan(arr[start - 1]):
+            count -= 1
+        if start < 0:
+            continue
+        
+        while max_head < max_tail and max_q[max_head] < start:
+            max_head += 1
+        while min_head < min_tail and min_q[min_head] < start:
+            min_head += 1
+        while first_valid <= i and (first_valid < start or np.isnan(arr[first_valid])):
+            first_valid += 1
+        
+        if count < 2:
+            continue
+        ptp = arr[max_q[max_head]] - arr[min_q[min_head]]
+        if ptp > 1e-6:
+            out[i] = (arr[last_valid] - arr[first_valid]) / ptp
+    return out
+
+@njit(cache=True, parallel=True)
+def _rolling_z_groups(x: np.ndarray, w: int, bounds: np.ndarray) -> np.ndarray:
+    """Apply _rolling_z to each contiguous group, with groups spread across cores.
+    
+    Args:
+        x: Column values, sorted so each group is contiguous
+        w: Window size
+        bounds: Group offsets; group g spans x[bounds[g]:bounds[g + 1]]
+        
+    Returns:
+        Array of z-scores aligned with x
+    """
+    out = np.empty_like(x)
+    for g in prange(bounds.shape[0] - 1):
+        out[bounds[g]:bounds[g + 1]] = _rolling_z(x[bounds[g]:bounds[g + 1]], w)
+    return out
+
+@njit(cache=True, parallel=True)
+def _norm30_groups(arr: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    """Apply _norm30 to each contiguous group, with groups spread across cores.
+    
+    Args:
+        arr: Column values, sorted so each group is contiguous
+        bounds: Group offsets; group g spans arr[bounds[g]:bounds[g + 1]]
+        
+    Returns:
+        Array of normalized momentum values aligned with arr
+    """
+    out = np.empty_like(arr)
+    for g in prange(bounds.shape[0] - 1):
+        out[bounds[g]:bounds[g + 1]] = _norm30(arr[bounds[g]:bounds[g + 1]])
+    return out
 
 def compute_metrics(df: pd.DataFrame) -> pd.DataFrame:
     """Compute momentum and heat metrics for watch data.
@@ -53,62 +188,55 @@ def compute_metrics(df: pd.DataFrame) -> pd.DataFrame:
         logger.warning("Empty dataframe passed to compute_metrics")
         return df
     
-    df = df.sort_values(["brand","reference","date"]).copy()
+    # sort_values already returns a new frame, so no defensive copy is needed
+    df = df.sort_values(["brand","reference","date"])
     
-    # Ensure required columns exist
+    # Ensure required columns exist, as float32: prices and counts don't need
+    # double precision, and it halves the bytes the groupby/rolling passes read
     for col in ["median_price","listings_active","dom_median"]:
         if col not in df.columns:
-            df[col] = pd.NA
+            df[col] = np.float32(np.nan)
             logger.warning(f"Missing column {col}, filling with NA")
+        else:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    
+    # Frame is sorted once above, so factorize the string keys into one integer
+    # group id and reuse it for every groupby instead of re-hashing brand/reference
+    gid = df.groupby(["brand","reference"], sort=False, observed=True).ngroup().to_numpy()
+    grouped = df.groupby(gid, sort=False)
+    # Groups are contiguous in the sorted frame; group g spans rows
+    # bounds[g]:bounds[g + 1]
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(gid)) + 1, [len(df)])).astype(np.int64)
+    
+    # Percentage changes are taken over values forward-filled within each group,
+    # so a gap at either end of the lookback uses the last observed value. This
+    # is what the implicit fill_method="pad" did; filling explicitly keeps the
+    # numbers without the deprecated argument.
+    filled = grouped[["median_price","listings_active","dom_median"]].ffill().groupby(gid, sort=False)
     
-    # Price percentage changes
+    # Price percentage changes (the first `periods` rows of each group, and so
+    # any group too short to have a full lookback, come out NaN)
     logger.debug("Computing price percentage changes...")
-    df["pct_7"] = df.groupby(["brand","reference"])["median_price"].transform(
-        lambda s: pct_change(s, 7) if len(s) > 7 else pd.Series([pd.NA] * len(s), index=s.index)
-    )
-    df["pct_14"] = df.groupby(["brand","reference"])["median_price"].transform(
-        lambda s: pct_change(s, 14) if len(s) > 14 else pd.Series([pd.NA] * len(s), index=s.index)
-    )
-    df["pct_30"] = df.groupby(["brand","reference"])["median_price"].transform(
-        lambda s: pct_change(s, 30) if len(s) > 30 else pd.Series([pd.NA] * len(s), index=s.index)
-    )
+    for periods in (7, 14, 30):
+        df[f"pct_{periods}"] = filled["median_price"].pct_change(periods, fill_method=None).mul(100.0)
     
     # Rolling z-score (90-day)
     logger.debug("Computing rolling z-scores...")
-    df["z90"] = df.groupby(["brand","reference"])["median_price"].transform(
-        lambda s: rolling_zscore(s, 90)
-    )
+    prices = df["median_price"].to_numpy()
+    df["z90"] = _rolling_z_groups(prices, 90, bounds)
     
     # Supply and DOM deltas (negative because decreasing supply/DOM is positive)
     logger.debug("Computing supply and DOM deltas...")
-    df["supply_delta_14"] = -df.groupby(["brand","reference"])["listings_active"].transform(
-        lambda s: pct_change(s, 14) if len(s) > 14 else pd.Series([pd.NA] * len(s), index=s.index)
-    )
-    df["dom_delta_14"] = -df.groupby(["brand","reference"])["dom_median"].transform(
-        lambda s: pct_change(s, 14) if len(s) > 14 and s.notna().sum() > 14 else pd.Series([pd.NA] * len(s), index=s.index)
-    )
+    df["supply_delta_14"] = -filled["listings_active"].pct_change(14, fill_method=None).mul(100.0)
+    # DOM is sparse, so also require more than 14 observed values per group
+    dom_count = grouped["dom_median"].transform("count")
+    df["dom_delta_14"] = -filled["dom_median"].pct_change(14, fill_method=None).mul(100.0).mask(dom_count < 15)
     
     # eBay momentum (30-day normalized change)
     if "ebay_activity" in df.columns:
         logger.debug("Computing eBay momentum...")
-        def norm30(s: pd.Series) -> pd.Series:
-            """Normalized 30-day momentum for eBay activity."""
-            if len(s) < 30:
-                return pd.Series([pd.NA] * len(s), index=s.index)
-            result = pd.Series([pd.NA] * len(s), index=s.index, dtype=float)
-            for i in range(29, len(s)):
-                window = s.iloc[i-29:i+1]
-                if window.notna().sum() < 2:
-                    continue
-                window_clean = window.dropna()
-                if len(window_clean) < 2:
-                    continue
-                ptp = window_clean.max() - window_clean.min()
-                if ptp > 1e-6:
-                    result.iloc[i] = (window_clean.iloc[-1] - window_clean.iloc[0]) / ptp
-            return result
-        
-        df["ebay_mom_30"] = df.groupby(["brand","reference"])["ebay_activity"].transform(norm30)
+        ebay = pd.to_numeric(df["ebay_activity"], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+        df["ebay_mom_30"] = _norm30_groups(ebay, bounds)
     else:
         df["ebay_mom_30"] = pd.NA
         logger.debug("No eBay activity column found")
@@ -116,6 +244,34 @@ def compute_metrics(df: pd.DataFrame) -> pd.DataFrame:
     logger.info(f"Computed metrics for {len(df)} records")
     return df
 
+# Heat score inputs and their weights, in _heat_kernel argument order
+HEAT_COLUMNS = ["pct_14", "pct_30", "dom_delta_14", "supply_delta_14", "z90", "ebay_mom_30"]
+HEAT_WEIGHTS = np.array([0.35, 0.25, 0.20, 0.20, 0.10, 0.10])
+
+def heat_score_vec(df: pd.DataFrame) -> np.ndarray:
+    """Calculate composite heat scores for every row of a metrics frame.
+    
+    Column-wise equivalent of ``df.apply(heat_score, axis=1)``; see
+    ``heat_score`` for the weighting. Missing components (NaN or absent
+    columns) are skipped, so a row with no usable metrics scores 0.0.
+    
+    Args:
+        df: DataFrame with numeric metric columns
+        
+    Returns:
+        Array of heat scores aligned with the rows of df
+    """
+    # compute_metrics produces these as float32 and they are passed through
+    # narrow, halving the bytes the kernel reads; anything else goes in as
+    # float64. The kernel is signatureless, so Numba specializes per dtype,
+    # and accumulation and the result stay float64 either way.
+    cols = [
+        df[col].to_numpy(dtype=np.float32 if df[col].dtype == np.float32 else np.float64, na_value=np.nan)
+        if col in df.columns else np.full(len(df), np.nan, dtype=np.float32)
+        for col in HEAT_COLUMNS
+    ]
+    return _heat_kernel(*cols, HEAT_WEIGHTS)
+
 def heat_score(row: pd.Series) -> float:
     """Calculate composite heat score for a watch.
     
@@ -133,39 +289,5 @@ def heat_score(row: pd.Series) -> float:
     Returns:
         Heat score between 0 and ~1.0 (can exceed 1.0 for very strong signals)
     """
-    comps = []
-    
-    # Price momentum components (weighted by 10% normalization)
-    for w, col in [(0.35, "pct_14"), (0.25, "pct_30"), (0.20, "dom_delta_14"), (0.20, "supply_delta_14")]:
-        val = row.get(col, pd.NA)
-        if pd.notna(val) and val != "":
-            try:
-                # Normalize percentage changes (divide by 10 to scale to reasonable range)
-                normalized = float(val) / 10.0
-                comps.append(w * normalized)
-            except (ValueError, TypeError):
-                pass
-    
-    # Z90 score (capped at 3.0, contributes up to 10%)
-    z = row.get("z90", pd.NA)
-    if pd.notna(z) and z != "":
-        try:
-            z_val = float(z)
-            # Cap at 3.0 and normalize to [0, 1]
-            z_normalized = max(0.0, min(z_val, 3.0)) / 3.0
-            comps.append(0.10 * z_normalized)
-        except (ValueError, TypeError):
-            pass
-    
-    # eBay momentum (normalized to [-1, 1], contributes up to 10%)
-    eb = row.get("ebay_mom_30", pd.NA)
-    if pd.notna(eb) and eb != "":
-        try:
-            eb_val = float(eb)
-            # Clamp to [-1, 1] range
-            eb_clamped = max(-1.0, min(eb_val, 1.0))
-            comps.append(0.10 * eb_clamped)
-        except (ValueError, TypeError):
-            pass
-    
-    return float(sum(comps)) if comps else 0.0
+    values = pd.to_numeric(row.reindex(HEAT_COLUMNS), errors="coerce")
+    return float(heat_score_vec(values.to_frame().T)[0])
@@ -1,5 +1,6 @@
 from __future__ import annotations
 import pandas as pd
+import numpy as np
 import logging
 from settings import TARGET_MARGIN_MIN, TARGET_MARGIN_MAX, SELLING_FEE_RATE, PAYMENT_FEE_RATE, SHIPPING_INSURANCE, MISC_BUFFER_RATE
 
@@ -21,23 +22,21 @@ def add_profit_overlay(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     fee_rate = SELLING_FEE_RATE + PAYMENT_FEE_RATE + MISC_BUFFER_RATE
     
-    # Calculate net proceeds after fees
-    df["resale_net_after_fees"] = (
-        df["median_price"] * (1 - fee_rate) - SHIPPING_INSURANCE
-    )
+    price = pd.to_numeric(df["median_price"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    missing = np.isnan(price)
+    
+    # Calculate net proceeds after fees (NaN where price is missing)
+    net = np.where(missing, np.nan, price * (1 - fee_rate) - SHIPPING_INSURANCE)
+    df["resale_net_after_fees"] = net
     
     # Calculate max bid prices for target margins
     # Formula: max_bid = net_proceeds * (1 - target_margin)
-    df["max_bid_for_8pct"] = df["resale_net_after_fees"] * (1 - TARGET_MARGIN_MIN)
-    df["max_bid_for_10pct"] = df["resale_net_after_fees"] * (1 - TARGET_MARGIN_MAX)
+    df["max_bid_for_8pct"] = net * (1 - TARGET_MARGIN_MIN)
+    df["max_bid_for_10pct"] = net * (1 - TARGET_MARGIN_MAX)
     
-    # Handle cases where price is missing
-    missing_price_count = df["median_price"].isna().sum()
+    missing_price_count = int(missing.sum())
     if missing_price_count > 0:
         logger.warning(f"{missing_price_count} watches missing price data")
-        df.loc[df["median_price"].isna(), "resale_net_after_fees"] = pd.NA
-        df.loc[df["median_price"].isna(), "max_bid_for_8pct"] = pd.NA
-        df.loc[df["median_price"].isna(), "max_bid_for_10pct"] = pd.NA
     
     logger.debug("Added profit overlay calculations")
     return df
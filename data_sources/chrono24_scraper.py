@@ -9,12 +9,19 @@ import random
 import re
 import statistics
 import logging
+import queue
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Optional, Iterable
 from pathlib import Path
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 from playwright.sync_api import sync_playwright, Browser, BrowserContext
+from selectolax.lexbor import LexborHTMLParser
 
 from settings import CACHE_DIR, LOOKBACK_DAYS
 
@@ -22,6 +29,24 @@ logger = logging.getLogger(__name__)
 
 # Rate limiting - Chrono24 is aggressive about bot detection
 REQUEST_DELAY = 5.0  # seconds between requests
+MAX_WORKERS = 3  # parallel browsers
+
+# Snapshot cache schema, applied at parse time when loading
+CACHE_COLUMNS = ["date", "brand", "reference", "median_price", "listings_active", "dom_median"]
+CACHE_COLUMN_TYPES = {
+    "date": pa.date32(),
+    "brand": pa.dictionary(pa.int32(), pa.string()),
+    "reference": pa.dictionary(pa.int32(), pa.string()),
+    "median_price": pa.float32(),
+    # Counts are parsed as floats: older cache files wrote them as "7.0"
+    # whenever the column had a gap
+    "listings_active": pa.float32(),
+    "dom_median": pa.float32(),
+}
+_CACHE_CONVERT_OPTIONS = pa_csv.ConvertOptions(
+    column_types=CACHE_COLUMN_TYPES,
+    include_columns=CACHE_COLUMNS,
+)
 
 # Rotate user agents to appear more human
 USER_AGENTS = [
@@ -31,6 +56,39 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0",
 ]
 
+# Listing-count patterns, tried in order:
+#   "716 Watches for..." in the results header, the same count in body text,
+#   and an explicit "Results: N" label
+_LISTING_COUNT_RES = [
+    re.compile(r'<h1[^>]*>.*?([\d,]+)\s*(?:watches|listings)\b', re.I | re.S),
+    re.compile(r'>([\d,]+)\s*(?:watches|listings|offers)\s*(?:for|found|available)', re.I | re.S),
+    re.compile(r'Results:\s*([\d,]+)', re.I | re.S),
+]
+_PRICE_RE = re.compile(r'\$\s*([\d,]+)')
+# Price elements in the parsed page; only nodes whose whole text is a single
+# price are used, which skips containers wrapping several listings
+_PRICE_SELECTOR = '[class*="price"]'
+_PRICE_TEXT_RE = re.compile(r'\$\s*([\d,]+)(?:\.\d{2})?')
+_HEADER_COUNT_RE = re.compile(r'([\d,]+)\s*(?:watches|listings)\b', re.I)
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces request starts at least `interval` seconds apart."""
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        """Block until the caller's turn to start a request."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
 
 class Chrono24Scraper:
     """Playwright-based Chrono24 scraper with bot detection evasion."""
@@ -120,8 +178,9 @@ class Chrono24Scraper:
                     return None
 
                 # Extract listing count and prices
-                listing_count = self._extract_listing_count(content)
-                prices = self._extract_prices(content)
+                tree = LexborHTMLParser(content)
+                listing_count = self._extract_listing_count(content, tree)
+                prices = self._extract_prices(content, tree)
 
                 if not prices:
                     logger.warning(f"No prices found for {brand} {reference}")
@@ -163,18 +222,18 @@ class Chrono24Scraper:
 
         return None
 
-    def _extract_listing_count(self, html: str) -> Optional[int]:
-        """Extract the number of listings from the page HTML."""
-        # Pattern 1: Look for "X Watches" or "X watches" in the results header
-        # This appears as "716 Watches for..." type text
-        patterns = [
-            r'<h1[^>]*>.*?([\d,]+)\s*(?:watches|listings)\b',  # In header
-            r'>([\d,]+)\s*(?:watches|listings|offers)\s*(?:for|found|available)',  # In text
-            r'Results:\s*([\d,]+)',  # Results count
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, html, re.I | re.S)
+    def _extract_listing_count(self, html: str, tree: Optional[LexborHTMLParser] = None) -> Optional[int]:
+        """Extract the number of listings from the page.
+
+        Reads the results header from the parsed tree, falling back to
+        regex scans of the raw HTML.
+        """
+        tree = tree if tree is not None else LexborHTMLParser(html)
+        header = tree.css_first("h1")
+        candidates = [_HEADER_COUNT_RE.search(header.text())] if header is not None else []
+        candidates.extend(pattern.search(html) for pattern in _LISTING_COUNT_RES)
+
+        for match in candidates:
             if match:
                 count = int(match.group(1).replace(',', ''))
                 # Sanity check: should be less than 100k for a specific reference
@@ -184,30 +243,36 @@ class Chrono24Scraper:
         # Fallback: count unique price entries (approximation)
         return None
 
-    def _extract_prices(self, html: str) -> List[int]:
-        """Extract listing prices from the page HTML."""
-        # Find all USD prices
-        all_prices = re.findall(r'\$\s*([\d,]+)', html)
+    def _extract_prices(self, html: str, tree: Optional[LexborHTMLParser] = None) -> List[int]:
+        """Extract listing prices from the page.
 
+        Reads price elements from the parsed tree, falling back to a regex
+        scan of the raw HTML when the selectors find nothing.
+        """
+        tree = tree if tree is not None else LexborHTMLParser(html)
+        matches = (_PRICE_TEXT_RE.fullmatch(node.text(strip=True)) for node in tree.css(_PRICE_SELECTOR))
+        prices = self._filter_prices(m for m in matches if m)
+        if not prices:
+            prices = self._filter_prices(_PRICE_RE.finditer(html))
+        return prices
+
+    @staticmethod
+    def _filter_prices(matches: Iterable[re.Match]) -> List[int]:
+        """Parse price matches, keeping plausible watch prices in first-seen order."""
+        # Deduplicate while preserving order (listings often show price twice)
+        seen = set()
         prices = []
-        for p_str in all_prices:
+        for m in matches:
             try:
-                price = int(p_str.replace(',', ''))
-                # Filter: watches are typically $1k-$500k, not shipping fees ($29-$200)
-                if 1000 < price < 500000:
-                    prices.append(price)
-            except ValueError:
+                price = int(m.group(1).replace(',', ''))
+            except ValueError:  # bare separators, e.g. "$,"
                 continue
+            # Filter: watches are typically $1k-$500k, not shipping fees ($29-$200)
+            if 1000 < price < 500000 and price not in seen:
+                seen.add(price)
+                prices.append(price)
 
-        # Deduplicate while preserving order (listings often show price twice)
-        seen = set()
-        unique_prices = []
-        for p in prices:
-            if p not in seen:
-                seen.add(p)
-                unique_prices.append(p)
-
-        return unique_prices
+        return prices
 
 
 def fetch_chrono24_daily(brand_ref_pairs: Iterable[tuple[str, str]]) -> pd.DataFrame:
@@ -224,33 +289,40 @@ def fetch_chrono24_daily(brand_ref_pairs: Iterable[tuple[str, str]]) -> pd.DataF
     """
     pairs_list = list(brand_ref_pairs)
     logger.info(f"Fetching Chrono24 data for {len(pairs_list)} watches...")
+    today = dt.date.today()
 
-    success_count = 0
+    # Playwright's sync API objects are bound to the thread that created them,
+    # so each worker runs its own browser. The shared limiter spaces request
+    # starts across all workers by REQUEST_DELAY.
+    pending: queue.SimpleQueue = queue.SimpleQueue()
+    for pair in pairs_list:
+        pending.put(pair)
+    limiter = RateLimiter(REQUEST_DELAY)
+    n_workers = min(MAX_WORKERS, len(pairs_list))
 
-    with Chrono24Scraper() as scraper:
-        for i, (brand, ref) in enumerate(pairs_list):
-            try:
-                snap = scraper.scrape_watch(brand, ref)
-                if snap:
-                    persist_daily_snapshot(snap)
-                    success_count += 1
-
-                # Rate limiting between requests
-                if i < len(pairs_list) - 1:
-                    time.sleep(REQUEST_DELAY)
-
-            except Exception as e:
-                logger.error(f"Error processing {brand} {ref}: {e}")
+    success_count = 0
+    if n_workers:
+        with ThreadPoolExecutor(max_workers=n_workers) as ex:
+            futures = [ex.submit(_scrape_worker, pending, limiter) for _ in range(n_workers)]
+            for fut in futures:
+                try:
+                    success_count += fut.result()
+                except Exception as e:
+                    logger.error(f"Scraper worker failed: {e}")
 
     logger.info(f"Successfully fetched {success_count}/{len(pairs_list)} watches")
 
-    # Load cached historical data
-    df = load_cached_series(pairs_list)
+    # Load cached historical data. A successful scrape makes today the newest
+    # cached date, so the lookback window can be applied while loading;
+    # otherwise it is anchored on the newest date found in the cache.
+    cutoff = dt.date.fromordinal(today.toordinal() - LOOKBACK_DAYS + 1) if success_count else None
+    df = load_cached_series(pairs_list, cutoff=cutoff)
 
     if not df.empty:
-        maxd = df["date"].max()
-        cutoff = dt.date.fromordinal(maxd.toordinal() - LOOKBACK_DAYS + 1)
-        df = df[df["date"] >= cutoff].copy()
+        if cutoff is None:
+            maxd = df["date"].max()
+            cutoff = dt.date.fromordinal(maxd.toordinal() - LOOKBACK_DAYS + 1)
+            df = df.loc[df["date"] >= cutoff]
         logger.info(f"Loaded {len(df)} historical records (last {LOOKBACK_DAYS} days)")
     else:
         logger.warning("No cached data found")
@@ -258,8 +330,37 @@ def fetch_chrono24_daily(brand_ref_pairs: Iterable[tuple[str, str]]) -> pd.DataF
     return df
 
 
+def _scrape_worker(pending: queue.SimpleQueue, limiter: RateLimiter) -> int:
+    """Scrape pairs from a shared queue with a dedicated browser until it is empty.
+
+    Returns:
+        Number of watches successfully scraped and persisted
+    """
+    success_count = 0
+    with Chrono24Scraper() as scraper:
+        while True:
+            try:
+                brand, ref = pending.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                limiter.wait()
+                snap = scraper.scrape_watch(brand, ref)
+                if snap:
+                    persist_daily_snapshot(snap)
+                    success_count += 1
+            except Exception as e:
+                logger.error(f"Error processing {brand} {ref}: {e}")
+    return success_count
+
+
 def persist_daily_snapshot(row: Dict[str, Any]):
-    """Save a daily snapshot to the cache."""
+    """Append a daily snapshot to the cache.
+
+    Rows are appended instead of rewriting the file, so each persist costs one
+    row of I/O. Re-running on the same day appends a second row for that date;
+    load_cached_series keeps the last one.
+    """
     path = CACHE_DIR / f"{row['brand']}__{row['reference']}.csv"
 
     # Keep only the columns we need for the cache
@@ -275,31 +376,42 @@ def persist_daily_snapshot(row: Dict[str, Any]):
     df = pd.DataFrame([cache_row])
 
     if path.exists():
-        old = pd.read_csv(path, parse_dates=["date"])
-        old["date"] = old["date"].dt.date
-        # Remove any existing entry for today
-        old = old[old["date"] != row["date"]]
-        df = pd.concat([old, df], ignore_index=True)
-
-    df.to_csv(path, index=False)
+        # Align with the existing header so columns line up on append
+        header = pd.read_csv(path, nrows=0).columns
+        df.reindex(columns=header).to_csv(path, mode="a", header=False, index=False)
+    else:
+        df.to_csv(path, index=False)
     logger.debug(f"Persisted snapshot for {row['brand']} {row['reference']}")
 
 
-def load_cached_series(pairs: Iterable[tuple[str, str]]) -> pd.DataFrame:
-    """Load cached historical data for given watch pairs."""
-    frames = []
+def load_cached_series(pairs: Iterable[tuple[str, str]], cutoff: Optional[dt.date] = None) -> pd.DataFrame:
+    """Load cached historical data for given watch pairs.
+
+    Args:
+        pairs: Iterable of (brand, reference) tuples
+        cutoff: If given, only rows dated on or after this date are kept
+
+    Returns:
+        DataFrame with cached snapshot rows
+    """
+    tables = []
 
     for brand, ref in pairs:
         p = CACHE_DIR / f"{brand}__{ref}.csv"
         if p.exists():
-            df = pd.read_csv(p, parse_dates=["date"])
-            df["date"] = df["date"].dt.date
-            frames.append(df[["date", "brand", "reference", "median_price", "listings_active", "dom_median"]])
-
-    if frames:
-        return pd.concat(frames, ignore_index=True)
-
-    return pd.DataFrame(columns=["date", "brand", "reference", "median_price", "listings_active", "dom_median"])
+            table = pa_csv.read_csv(p, convert_options=_CACHE_CONVERT_OPTIONS)
+            if cutoff is not None:
+                table = table.filter(pc.greater_equal(table["date"], pa.scalar(cutoff, pa.date32())))
+            tables.append(table)
+
+    if tables:
+        # date32 converts to datetime.date and dictionaries to categoricals
+        df = pa.concat_tables(tables).to_pandas(split_blocks=True, self_destruct=True)
+        # Snapshots are append-only; the last row for a date wins
+        return df.drop_duplicates(subset=["date", "brand", "reference"], keep="last", ignore_index=True)
+
+    # Same column dtypes as a loaded cache, so callers never see object columns
+    return pa.schema(CACHE_COLUMN_TYPES).empty_table().to_pandas()
 
 
 if __name__ == "__main__":
@@ -2,19 +2,37 @@ from __future__ import annotations
 import datetime as dt
 import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import requests, pandas as pd
-from typing import Iterable
+from requests.adapters import HTTPAdapter
+from typing import Iterable, Optional
 from settings import EBAY_OAUTH_TOKEN
 
 logger = logging.getLogger(__name__)
 BROWSE_SEARCH = "https://api.ebay.com/buy/browse/v1/item_summary/search"
 MAX_RETRIES = 3
 RETRY_DELAY = 1.0
+MAX_WORKERS = 8  # concurrent Browse API requests
 
-def _hdrs():
-    if not EBAY_OAUTH_TOKEN:
-        raise RuntimeError("EBAY_OAUTH_TOKEN missing. Add it to .env")
-    return {"Authorization": f"Bearer {EBAY_OAUTH_TOKEN}"}
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+def _session() -> requests.Session:
+    """Shared keep-alive session carrying the auth header, created on first use."""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                if not EBAY_OAUTH_TOKEN:
+                    raise RuntimeError("EBAY_OAUTH_TOKEN missing. Add it to .env")
+                session = requests.Session()
+                session.headers.update({"Authorization": f"Bearer {EBAY_OAUTH_TOKEN}"})
+                # Keep one pooled connection per concurrent worker
+                session.mount("https://", HTTPAdapter(pool_maxsize=MAX_WORKERS))
+                _SESSION = session
+    return _SESSION
 
 def search_count(q: str) -> int:
     """Get search count for a query string.
@@ -25,9 +43,10 @@ def search_count(q: str) -> int:
     Returns:
         Number of matching results, or 0 if error
     """
+    session = _session()
     for attempt in range(MAX_RETRIES):
         try:
-            r = requests.get(BROWSE_SEARCH, params={"q": q, "limit": 1, "offset": 0}, headers=_hdrs(), timeout=20)
+            r = session.get(BROWSE_SEARCH, params={"q": q, "limit": 1, "offset": 0}, timeout=20)
             r.raise_for_status()
             js = r.json()
             return int(js.get("total") or js.get("totalMatched") or 0)
@@ -41,9 +60,19 @@ def search_count(q: str) -> int:
                 return 0
     return 0
 
+def _pair_count(brand: str, ref: str) -> Optional[int]:
+    """Search count for one pair, or None if the lookup raised."""
+    try:
+        return search_count(f"{brand} {ref}")
+    except Exception as e:
+        logger.error(f"Error fetching eBay signal for {brand} {ref}: {e}")
+        return None
+
 def fetch_ebay_signal(brand_ref_pairs: Iterable[tuple[str, str]]) -> pd.DataFrame:
     """Fetch eBay activity signal for given brand/reference pairs.
     
+    Lookups are I/O-bound, so up to MAX_WORKERS run concurrently.
+    
     Args:
         brand_ref_pairs: Iterable of (brand, reference) tuples
         
@@ -54,15 +83,21 @@ def fetch_ebay_signal(brand_ref_pairs: Iterable[tuple[str, str]]) -> pd.DataFram
     logger.info(f"Fetching eBay signals for {len(pairs_list)} watches...")
     
     today = dt.date.today()
-    rows = []
-    for brand, ref in pairs_list:
-        try:
-            query = f"{brand} {ref}"
-            cnt = search_count(query)
-            rows.append({"date": today, "brand": brand, "reference": ref, "ebay_activity": cnt})
-        except Exception as e:
-            logger.error(f"Error fetching eBay signal for {brand} {ref}: {e}")
-            rows.append({"date": today, "brand": brand, "reference": ref, "ebay_activity": None})
+    n = len(pairs_list)
+    brands = np.empty(n, dtype=object)
+    refs = np.empty(n, dtype=object)
+    counts = np.full(n, -1, dtype=np.int64)  # -1 marks a failed lookup
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        for i, cnt in enumerate(ex.map(lambda pair: _pair_count(*pair), pairs_list)):
+            brands[i], refs[i] = pairs_list[i]
+            if cnt is not None:
+                counts[i] = cnt
     
-    logger.info(f"Successfully fetched {len([r for r in rows if r['ebay_activity'] is not None])}/{len(rows)} eBay signals")
-    return pd.DataFrame(rows)
+    ok = counts >= 0
+    logger.info(f"Successfully fetched {int(ok.sum())}/{n} eBay signals")
+    return pd.DataFrame({
+        "date": today,
+        "brand": brands,
+        "reference": refs,
+        "ebay_activity": np.where(ok, counts, np.nan).astype(np.float32),
+    })
@@ -1,24 +1,42 @@
 from __future__ import annotations
 import datetime as dt
+import functools
+import shelve
 import time
 import logging
 from typing import Iterable, Tuple, Dict, Any, Optional
 import requests, pandas as pd
+from requests.adapters import HTTPAdapter
 from settings import WATCHCHARTS_API_KEY, LOOKBACK_DAYS, CACHE_DIR
 
 logger = logging.getLogger(__name__)
 API_ROOT = "https://api.watchcharts.com/v3"
 MAX_RETRIES = 3
 RETRY_DELAY = 1.0  # seconds
+POOL_SIZE = 16  # pooled keep-alive connections to the API host
+UUID_CACHE_PATH = CACHE_DIR / "uuid_cache"  # (brand, reference) -> UUID, kept across runs
 
-def _hdrs():
-    if not WATCHCHARTS_API_KEY:
-        raise RuntimeError("WATCHCHARTS_API_KEY missing. Add it to .env")
-    return {"x-api-key": WATCHCHARTS_API_KEY}
+_SESSION: Optional[requests.Session] = None
 
+def _session() -> requests.Session:
+    """Shared keep-alive session carrying the API key, created on first use."""
+    global _SESSION
+    if _SESSION is None:
+        if not WATCHCHARTS_API_KEY:
+            raise RuntimeError("WATCHCHARTS_API_KEY missing. Add it to .env")
+        session = requests.Session()
+        session.headers.update({"x-api-key": WATCHCHARTS_API_KEY})
+        session.mount("https://", HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE))
+        _SESSION = session
+    return _SESSION
+
+@functools.lru_cache(maxsize=None)
 def lookup_uuid(brand: str, reference: str) -> Optional[str]:
     """Look up UUID for a watch by brand and reference.
     
+    UUIDs are stable, so successful lookups are stored in an on-disk shelf
+    and later runs skip the search API call.
+    
     Args:
         brand: Watch brand name
         reference: Watch reference number
@@ -26,11 +44,26 @@ def lookup_uuid(brand: str, reference: str) -> Optional[str]:
     Returns:
         UUID string if found, None otherwise
     """
+    key = f"{brand}__{reference}"
+    with shelve.open(str(UUID_CACHE_PATH)) as db:
+        uuid = db.get(key)
+    if uuid:
+        return uuid
+    
+    uuid = _search_uuid(brand, reference)
+    if uuid:
+        with shelve.open(str(UUID_CACHE_PATH)) as db:
+            db[key] = uuid
+    return uuid
+
+def _search_uuid(brand: str, reference: str) -> Optional[str]:
+    """Query the search API for a watch's UUID."""
     params = {"brand_name": brand, "reference": reference}
+    session = _session()
     
     for attempt in range(MAX_RETRIES):
         try:
-            r = requests.get(f"{API_ROOT}/search/watch", params=params, headers=_hdrs(), timeout=20)
+            r = session.get(f"{API_ROOT}/search/watch", params=params, timeout=20)
             r.raise_for_status()
             js = r.json()
             if isinstance(js, dict) and js.get("results"):
@@ -61,9 +94,10 @@ def get_watch_info(uuid: str) -> Dict[str, Any]:
     Raises:
         requests.exceptions.RequestException: If API call fails after retries
     """
+    session = _session()
     for attempt in range(MAX_RETRIES):
         try:
-            r = requests.get(f"{API_ROOT}/watch/info", params={"uuid": uuid}, headers=_hdrs(), timeout=20)
+            r = session.get(f"{API_ROOT}/watch/info", params={"uuid": uuid}, timeout=20)
             r.raise_for_status()
             return r.json()
         except requests.exceptions.RequestException as e:
@@ -113,11 +147,11 @@ def persist_daily_snapshot(row: Dict[str, Any]):
     path = CACHE_DIR / f"{row['brand']}__{row['reference']}.csv"
     df = pd.DataFrame([row])
     if path.exists():
-        old = pd.read_csv(path, parse_dates=["date"])
-        old["date"] = old["date"].dt.date
-        old = old[old["date"] != row["date"]]
-        df = pd.concat([old, df], ignore_index=True)
-    df.to_csv(path, index=False)
+        # Append-only; load_cached_series keeps the last row per date
+        header = pd.read_csv(path, nrows=0).columns
+        df.reindex(columns=header).to_csv(path, mode="a", header=False, index=False)
+    else:
+        df.to_csv(path, index=False)
 
 def load_cached_series(pairs: Iterable[Tuple[str, str]]) -> pd.DataFrame:
     frames = []
@@ -126,5 +160,6 @@ def load_cached_series(pairs: Iterable[Tuple[str, str]]) -> pd.DataFrame:
         if p.exists():
             df = pd.read_csv(p, parse_dates=["date"])
             df["date"] = df["date"].dt.date
+            df = df.drop_duplicates(subset=["date"], keep="last")
             frames.append(df[["date","brand","reference","median_price","listings_active","dom_median"]])
     return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["date","brand","reference","median_price","listings_active","dom_median"])
@@ -2,21 +2,22 @@ from __future__ import annotations
 import sys
 import logging
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
+import datetime as dt
 
 ROOT = Path(__file__).resolve().parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-import pandas as pd
-import datetime as dt
-
 from settings import MIN_LISTINGS, HEAT_THRESHOLD
-from data_sources.watchcharts import fetch_watchcharts_daily
-from data_sources.ebay import fetch_ebay_signal
-from analytics.metrics import compute_metrics, heat_score
-from analytics.profit import add_profit_overlay
-from report.render import render_html
+
+# pandas, pyarrow, Numba and the pipeline modules are imported inside the
+# functions that use them, so --help and argument errors return without
+# paying for them
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Configure logging
 logging.basicConfig(
@@ -42,6 +43,8 @@ def load_universe(path: Path) -> pd.DataFrame:
         FileNotFoundError: If universe file doesn't exist
         ValueError: If required columns are missing
     """
+    import pandas as pd
+
     if not path.exists():
         raise FileNotFoundError(f"Universe file not found: {path}")
     
@@ -52,34 +55,53 @@ def load_universe(path: Path) -> pd.DataFrame:
         if missing:
             raise ValueError(f"Missing required columns in universe: {missing}")
         
-        u["brand"] = u["brand"].astype(str)
-        u["reference"] = u["reference"].astype(str)
+        # Low-cardinality keys: category codes keep merges, groupbys and
+        # sorts integer-keyed downstream
+        u["brand"] = u["brand"].astype(str).astype("category")
+        u["reference"] = u["reference"].astype(str).astype("category")
         logger.info(f"Loaded {len(u)} watches from universe file")
         return u
     except Exception as e:
         logger.error(f"Error loading universe file: {e}")
         raise
 
-def run(output_dir: Path, run_date: dt.date | None = None) -> tuple[Path, Path, pd.DataFrame]:
+def run(output_dir: Path, run_date: dt.date | None = None, gzip_html: bool = False) -> tuple[Path, Path, pd.DataFrame]:
     """Run the watch heat analysis pipeline.
     
     Args:
         output_dir: Directory to save output files
         run_date: Optional date to use instead of today's date
+        gzip_html: Write the HTML report gzip-compressed (.html.gz)
         
     Returns:
         Tuple of (csv_path, html_path, dataframe)
     """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    from data_sources.watchcharts import fetch_watchcharts_daily
+    from data_sources.ebay import fetch_ebay_signal
+    from analytics.metrics import compute_metrics, heat_score_vec
+    from analytics.profit import add_profit_overlay
+    from report.render import render_html
+
     logger.info("Starting watch heat analysis")
     output_dir.mkdir(parents=True, exist_ok=True)
     
     try:
         universe = load_universe(ROOT / "universe.csv")
-        pairs = list(universe[["brand","reference"]].itertuples(index=False, name=None))
+        # Materialized once: both fetchers iterate it, concurrently
+        pairs = list(zip(universe["brand"].to_numpy(), universe["reference"].to_numpy()))
         logger.info(f"Processing {len(pairs)} watch references")
 
-        logger.info("Fetching WatchCharts data...")
-        wc_df = fetch_watchcharts_daily(pairs)
+        # Both fetches are network-bound, so run them concurrently
+        logger.info("Fetching WatchCharts and eBay signal data...")
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            wc_future = ex.submit(fetch_watchcharts_daily, pairs)
+            eb_future = ex.submit(fetch_ebay_signal, pairs)
+            wc_df = wc_future.result()
+            eb_df = eb_future.result()
         logger.info(f"WatchCharts: {len(wc_df)} records")
         
         # Validate WatchCharts data
@@ -91,8 +113,6 @@ def run(output_dir: Path, run_date: dt.date | None = None) -> tuple[Path, Path,
             if missing:
                 raise ValueError(f"WatchCharts data missing required columns: {missing}")
 
-        logger.info("Fetching eBay signal data...")
-        eb_df = fetch_ebay_signal(pairs)
         logger.info(f"eBay: {len(eb_df)} records")
         
         # Validate eBay data
@@ -106,7 +126,15 @@ def run(output_dir: Path, run_date: dt.date | None = None) -> tuple[Path, Path,
         if wc_df.empty:
             raise ValueError("Cannot proceed without WatchCharts data")
         
-        df = wc_df.merge(eb_df, on=["date","brand","reference"], how="left")
+        # Index-based join; validate catches duplicated keys that would
+        # otherwise silently multiply rows
+        # Both sources are cast to the universe's categories, so key codes line
+        # up without needing union_categoricals
+        key_dtypes = {"brand": universe["brand"].dtype, "reference": universe["reference"].dtype}
+        wc_df = wc_df.astype(key_dtypes)
+        eb_df = eb_df.astype(key_dtypes)
+        keys = ["date","brand","reference"]
+        df = wc_df.set_index(keys).join(eb_df.set_index(keys), how="left", validate="one_to_one").reset_index()
         
         # Validate merged data
         if df.empty:
@@ -123,41 +151,40 @@ def run(output_dir: Path, run_date: dt.date | None = None) -> tuple[Path, Path,
         last_date = df["date"].max() if run_date is None else run_date
         logger.info(f"Using date: {last_date}")
         
-        snap = df[df["date"] == last_date].copy()
-        if snap.empty:
+        on_date = df["date"] == last_date
+        if not on_date.any():
             logger.warning(f"No data found for date {last_date}")
             # Try to use the most recent available date
             last_date = df["date"].max()
-            snap = df[df["date"] == last_date].copy()
+            on_date = df["date"] == last_date
             logger.info(f"Using most recent available date: {last_date}")
         
-        snap = snap.merge(universe, on=["brand","reference"], how="left")
-        
-        # Validate and clean data
-        if "listings_active" not in snap.columns:
-            logger.warning("listings_active column missing, creating with default value")
-            snap["listings_active"] = 0
+        # Apply the listings filter on the full frame before merging, so the
+        # universe join only touches rows that are kept
+        if "listings_active" not in df.columns:
+            logger.warning("listings_active column missing, treating as 0")
+            listings = pd.Series(0, index=df.index)
         else:
-            snap["listings_active"] = pd.to_numeric(snap["listings_active"], errors="coerce").fillna(0)
+            listings = df["listings_active"].fillna(0)
+        keep = on_date & (listings >= MIN_LISTINGS)
+        filtered_count = int(on_date.sum()) - int(keep.sum())
+        if filtered_count > 0:
+            logger.info(f"Filtered out {filtered_count} watches with < {MIN_LISTINGS} listings")
         
-        # Validate price data
+        snap = df.loc[keep].assign(listings_active=listings[keep]).merge(
+            universe, on=["brand","reference"], how="left", validate="many_to_one"
+        )
+        
+        # Validate price data (compute_metrics already made it float32)
         if "median_price" not in snap.columns:
             logger.warning("median_price column missing")
             snap["median_price"] = pd.NA
-        else:
-            snap["median_price"] = pd.to_numeric(snap["median_price"], errors="coerce")
-        
-        initial_count = len(snap)
-        snap = snap[snap["listings_active"] >= MIN_LISTINGS].copy()
-        filtered_count = initial_count - len(snap)
-        if filtered_count > 0:
-            logger.info(f"Filtered out {filtered_count} watches with < {MIN_LISTINGS} listings")
         
         if snap.empty:
             raise ValueError(f"No watches meet minimum listing requirement ({MIN_LISTINGS})")
         
         logger.info("Computing heat scores...")
-        snap["heat"] = snap.apply(heat_score, axis=1)
+        snap["heat"] = heat_score_vec(snap)
         snap["is_hot"] = snap["heat"] >= HEAT_THRESHOLD
         
         hot_count = snap["is_hot"].sum()
@@ -169,12 +196,30 @@ def run(output_dir: Path, run_date: dt.date | None = None) -> tuple[Path, Path,
         snap_sorted = add_profit_overlay(snap_sorted)
 
         csv_path = output_dir / f"watch_heat_{last_date}.csv"
-        snap_sorted.to_csv(csv_path, index=False)
+        # Arrow's C++ writer formats whole column buffers; pyarrow is already a
+        # hard dependency via the Chrono24 cache
+        table = pa.Table.from_pandas(snap_sorted, preserve_index=False)
+        pa_csv.write_csv(table, csv_path, pa_csv.WriteOptions(quoting_style="needed"))
         logger.info(f"Saved CSV: {csv_path}")
 
-        rows = snap_sorted.fillna("").to_dict(orient="records")
+        # Typed columnar copy for re-reads; the categorical keys are stored
+        # dictionary-encoded
+        parquet_path = output_dir / f"watch_heat_{last_date}.parquet"
+        pq.write_table(table, parquet_path, compression="zstd")
+        logger.info(f"Saved Parquet: {parquet_path}")
+
         html_path = output_dir / f"watch_heat_{last_date}.html"
-        render_html(rows, html_path, run_date=str(last_date))
+        # Heat is a dense float column here (the kernel scores rows with no
+        # usable metrics as 0.0), so the header stats are two reductions
+        heat = snap_sorted["heat"].to_numpy()
+        html_path = render_html(
+            snap_sorted,
+            html_path,
+            run_date=str(last_date),
+            compress=gzip_html,
+            avg_heat=f"{heat.mean():.2f}",
+            max_heat=f"{heat.max():.2f}",
+        )
         logger.info(f"Saved HTML: {html_path}")
         
         return csv_path, html_path, snap_sorted
@@ -196,6 +241,11 @@ if __name__ == "__main__":
         default=None,
         help="Date to analyze (YYYY-MM-DD, default: today or most recent available)"
     )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Write the HTML report gzip-compressed (.html.gz)"
+    )
     parser.add_argument(
         "--verbose",
         "-v",
@@ -212,7 +262,7 @@ if __name__ == "__main__":
     run_date = dt.datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
     
     try:
-        csv_path, html_path, snap = run(output_dir, run_date)
+        csv_path, html_path, snap = run(output_dir, run_date, gzip_html=args.gzip)
         print(f"\n✓ Analysis complete!")
         print(f"  CSV:  {csv_path}")
         print(f"  HTML: {html_path}")
@@ -1,7 +1,12 @@
 from __future__ import annotations
 from jinja2 import Template
+import gzip
+import json
+from collections import namedtuple
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Iterator
+import numpy as np
+import pandas as pd
 
 HTML_TMPL = """
 <!doctype html>
@@ -243,32 +248,25 @@ HTML_TMPL = """
           </tr>
         </thead>
         <tbody>
-        {% for r in rows %}
-          <tr class="{{ 'hot' if r.get('is_hot') else '' }}" data-hot="{{ 'true' if r.get('is_hot') else 'false' }}">
-            <td>{{ r.get('brand', '') }}</td>
-            <td><code>{{ r.get('reference', '') }}</code></td>
-            <td>{{ r.get('display_name', '') }}</td>
-            <td class="number">${{ '{:,.0f}'.format(r['median_price']) if r.get('median_price') not in (None, '') and r.get('median_price') != '' else '—' }}</td>
-            <td class="number {{ 'positive' if r.get('pct_7', 0) not in (None, '') and r.get('pct_7', 0) > 0 else 'negative' if r.get('pct_7', 0) not in (None, '') and r.get('pct_7', 0) < 0 else '' }}">{{ '{:+.1f}'.format(r['pct_7']) if r.get('pct_7') not in (None, '') and r.get('pct_7') != '' else '—' }}</td>
-            <td class="number {{ 'positive' if r.get('pct_14', 0) not in (None, '') and r.get('pct_14', 0) > 0 else 'negative' if r.get('pct_14', 0) not in (None, '') and r.get('pct_14', 0) < 0 else '' }}">{{ '{:+.1f}'.format(r['pct_14']) if r.get('pct_14') not in (None, '') and r.get('pct_14') != '' else '—' }}</td>
-            <td class="number {{ 'positive' if r.get('pct_30', 0) not in (None, '') and r.get('pct_30', 0) > 0 else 'negative' if r.get('pct_30', 0) not in (None, '') and r.get('pct_30', 0) < 0 else '' }}">{{ '{:+.1f}'.format(r['pct_30']) if r.get('pct_30') not in (None, '') and r.get('pct_30') != '' else '—' }}</td>
-            <td class="number">{{ '{:+.2f}'.format(r['z90']) if r.get('z90') not in (None, '') and r.get('z90') != '' else '—' }}</td>
-            <td class="number {{ 'positive' if r.get('dom_delta_14', 0) not in (None, '') and r.get('dom_delta_14', 0) > 0 else 'negative' if r.get('dom_delta_14', 0) not in (None, '') and r.get('dom_delta_14', 0) < 0 else '' }}">{{ '{:+.1f}'.format(r['dom_delta_14']) if r.get('dom_delta_14') not in (None, '') and r.get('dom_delta_14') != '' else '—' }}</td>
-            <td class="number {{ 'positive' if r.get('supply_delta_14', 0) not in (None, '') and r.get('supply_delta_14', 0) > 0 else 'negative' if r.get('supply_delta_14', 0) not in (None, '') and r.get('supply_delta_14', 0) < 0 else '' }}">{{ '{:+.1f}'.format(r['supply_delta_14']) if r.get('supply_delta_14') not in (None, '') and r.get('supply_delta_14') != '' else '—' }}</td>
-            <td class="number">{{ '{:+.2f}'.format(r['ebay_mom_30']) if r.get('ebay_mom_30') not in (None, '') and r.get('ebay_mom_30') != '' else '—' }}</td>
-            <td class="number heat-{{ 'high' if r.get('heat', 0) not in (None, '') and r.get('heat', 0) >= 0.75 else 'medium' if r.get('heat', 0) not in (None, '') and r.get('heat', 0) >= 0.5 else 'low' if r.get('heat', 0) not in (None, '') and r.get('heat', 0) > 0 else '' }}">{{ '{:+.2f}'.format(r['heat']) if r.get('heat') not in (None, '') and r.get('heat') != '' else '—' }}{% if r.get('is_hot') %} <span class="badge badge-hot">HOT</span>{% endif %}</td>
-            <td class="number">${{ '{:,.0f}'.format(r['max_bid_for_8pct']) if r.get('max_bid_for_8pct') not in (None, '') and r.get('max_bid_for_8pct') != '' else '—' }}</td>
-            <td class="number">${{ '{:,.0f}'.format(r['max_bid_for_10pct']) if r.get('max_bid_for_10pct') not in (None, '') and r.get('max_bid_for_10pct') != '' else '—' }}</td>
-          </tr>
-        {% endfor %}
-        </tbody>
+{{ tbody_html }}        </tbody>
       </table>
     </div>
   </div>
-
+{% if rows_json %}
+  <script type="application/json" id="rowData">{{ rows_json }}</script>
+{% endif %}
   <script>
     const table = document.getElementById('watchTable');
     const tbody = table.querySelector('tbody');
+{%- if rows_json %}
+    // Large reports carry their rows as JSON; build them before the search
+    // and sort handlers below take their snapshot of the table
+    const { fields, rows } = JSON.parse(document.getElementById('rowData').textContent);
+    tbody.innerHTML = rows.map(values => {
+      const r = Object.fromEntries(fields.map((f, i) => [f, values[i]]));
+      return `{{ row_js }}`;
+    }).join('');
+{% endif %}
     const searchInput = document.getElementById('searchInput');
     const showAll = document.getElementById('showAll');
     const showHot = document.getElementById('showHot');
@@ -369,31 +367,169 @@ HTML_TMPL = """
 </html>
 """
 
-def render_html(rows: List[Dict[str, Any]], out_path: Path, run_date: str) -> None:
+# Compiled once per process rather than re-parsed on every render
+_TMPL = Template(HTML_TMPL)
+
+def _num(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Column as a float array, NaN where missing or the column is absent."""
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+def _text(df: pd.DataFrame, col: str) -> pd.Series:
+    """Column as strings, blank where missing or the column is absent."""
+    if col not in df.columns:
+        return pd.Series("", index=df.index)
+    return df[col].astype(object).fillna("").astype(str)
+
+# CSS class per np.sign value, indexed by sign + 1
+_SIGN_CLASSES = np.array(["negative", "", "positive"])
+
+def _cells(values: np.ndarray, spec: str, index: pd.Index) -> tuple[pd.Series, np.ndarray]:
+    """Format a numeric column and derive its sign class from one null mask.
+
+    Returns:
+        Tuple of (text formatted with spec, em dash where missing;
+        'positive'/'negative'/'' class per value, blank where missing)
+    """
+    valid = ~np.isnan(values)
+    text = pd.Series("—", index=index, dtype=object)
+    text[valid] = [spec.format(v) for v in values[valid]]
+    sign = _SIGN_CLASSES[np.sign(np.where(valid, values, 0.0)).astype(np.int64) + 1]
+    return text, sign
+
+# One <tr> per report row, filled from _Row attributes
+_ROW_HTML = """          <tr class="{r.row_class}" data-hot="{r.data_hot}">
+            <td>{r.brand}</td>
+            <td><code>{r.reference}</code></td>
+            <td>{r.display_name}</td>
+            <td class="number">${r.median_price}</td>
+            <td class="number {r.pct_7_class}">{r.pct_7}</td>
+            <td class="number {r.pct_14_class}">{r.pct_14}</td>
+            <td class="number {r.pct_30_class}">{r.pct_30}</td>
+            <td class="number">{r.z90}</td>
+            <td class="number {r.dom_delta_14_class}">{r.dom_delta_14}</td>
+            <td class="number {r.supply_delta_14_class}">{r.supply_delta_14}</td>
+            <td class="number">{r.ebay_mom_30}</td>
+            <td class="number heat-{r.heat_tier}">{r.heat}{r.hot_badge}</td>
+            <td class="number">${r.max_bid_for_8pct}</td>
+            <td class="number">${r.max_bid_for_10pct}</td>
+          </tr>
+"""
+
+# Appended to the heat cell of hot rows
+_HOT_BADGE = ' <span class="badge badge-hot">HOT</span>'
+
+_SIGNED_COLUMNS = ["pct_7", "pct_14", "pct_30", "dom_delta_14", "supply_delta_14"]
+
+# Pre-formatted cell strings for one table row
+_Row = namedtuple("_Row", [
+    "row_class", "data_hot", "brand", "reference", "display_name", "median_price",
+    *_SIGNED_COLUMNS, *(f"{c}_class" for c in _SIGNED_COLUMNS),
+    "z90", "ebay_mom_30", "heat", "heat_tier", "hot_badge", "max_bid_for_8pct", "max_bid_for_10pct",
+])
+
+# Reports with more rows than this ship their cells as JSON and build the
+# table in the browser, rather than carrying every row as markup
+_HYDRATE_MIN_ROWS = 5000
+
+# _ROW_HTML as the body of a JS template literal over the same fields
+_ROW_JS = _ROW_HTML.replace("{r.", "${r.")
+
+def _row_values(df: pd.DataFrame) -> Iterator[tuple[str, ...]]:
+    """Pre-formatted cell strings for every row, in _Row field order.
+
+    Each column is formatted as a whole and the columns are zipped into rows.
+    """
+    idx = df.index
+    is_hot = df["is_hot"].fillna(False).astype(bool).to_numpy() if "is_hot" in df.columns else np.zeros(len(df), dtype=bool)
+    heat = _num(df, "heat")
+
+    cols = {
+        "row_class": np.where(is_hot, "hot", ""),
+        "data_hot": np.where(is_hot, "true", "false"),
+        "brand": _text(df, "brand"),
+        "reference": _text(df, "reference"),
+        "display_name": _text(df, "display_name"),
+        "z90": _cells(_num(df, "z90"), "{:+.2f}", idx)[0],
+        "ebay_mom_30": _cells(_num(df, "ebay_mom_30"), "{:+.2f}", idx)[0],
+        "heat": _cells(heat, "{:+.2f}", idx)[0],
+        "heat_tier": np.where(heat >= 0.75, "high", np.where(heat >= 0.5, "medium", np.where(heat > 0, "low", ""))),
+        "hot_badge": np.where(is_hot, _HOT_BADGE, ""),
+    }
+    for col in ["median_price", "max_bid_for_8pct", "max_bid_for_10pct"]:
+        cols[col] = _cells(_num(df, col), "{:,.0f}", idx)[0]
+    for col in _SIGNED_COLUMNS:
+        cols[col], cols[f"{col}_class"] = _cells(_num(df, col), "{:+.1f}", idx)
+
+    return zip(*(cols[f] for f in _Row._fields))
+
+def _build_tbody(df: pd.DataFrame) -> str:
+    """Render every table row, one format call on _ROW_HTML per row."""
+    return "".join(_ROW_HTML.format(r=r) for r in map(_Row._make, _row_values(df)))
+
+def _build_rows_json(df: pd.DataFrame) -> str:
+    """Serialize every row's cells as compact JSON for in-browser hydration."""
+    data = json.dumps({"fields": _Row._fields, "rows": list(_row_values(df))}, separators=(",", ":"))
+    # Keep the payload from closing its <script> element early
+    return data.replace("</", "<\\/")
+
+def render_html(
+    df: pd.DataFrame,
+    out_path: Path,
+    run_date: str,
+    compress: bool = False,
+    avg_heat: str | None = None,
+    max_heat: str | None = None,
+) -> Path:
     """Render HTML report from watch data.
 
     Args:
-        rows: List of dictionaries containing watch data
+        df: DataFrame of watch data, one row per table row, in display order
         out_path: Path to save HTML file
         run_date: Date string for the report
+        compress: Write gzip-compressed HTML to out_path with a .html.gz suffix instead
+        avg_heat: Pre-formatted average heat score; computed from df if omitted
+        max_heat: Pre-formatted maximum heat score; computed from df if omitted
+
+    Returns:
+        Path of the file written
     """
-    if not rows:
+    if df.empty:
         raise ValueError("No rows to render")
 
     # Calculate statistics
-    total_count = len(rows)
-    hot_count = sum(1 for r in rows if r.get('is_hot'))
+    total_count = len(df)
+    hot_count = int(df["is_hot"].fillna(False).astype(bool).sum()) if "is_hot" in df.columns else 0
+
+    if avg_heat is None or max_heat is None:
+        heat_values = _num(df, "heat")
+        heat_values = heat_values[~np.isnan(heat_values)]
+        if avg_heat is None:
+            avg_heat = f"{heat_values.mean():.2f}" if heat_values.size else "0.00"
+        if max_heat is None:
+            max_heat = f"{heat_values.max():.2f}" if heat_values.size else "0.00"
 
-    heat_values = [float(r.get('heat', 0)) for r in rows if r.get('heat') not in (None, '', '') and str(r.get('heat', '')).strip()]
-    avg_heat = f"{sum(heat_values) / len(heat_values):.2f}" if heat_values else "0.00"
-    max_heat = f"{max(heat_values):.2f}" if heat_values else "0.00"
+    hydrate = total_count > _HYDRATE_MIN_ROWS
 
-    html = Template(HTML_TMPL).render(
-        rows=rows,
+    # Stream the document straight to disk instead of building it as one string
+    stream = _TMPL.stream(
+        tbody_html="" if hydrate else _build_tbody(df),
+        rows_json=_build_rows_json(df) if hydrate else "",
+        row_js=_ROW_JS if hydrate else "",
         run_date=run_date,
         total_count=total_count,
         hot_count=hot_count,
         avg_heat=avg_heat,
         max_heat=max_heat
     )
-    Path(out_path).write_text(html, encoding="utf-8")
+    out_path = Path(out_path)
+    if compress:
+        # The markup is highly repetitive, so gzip shrinks large reports a lot
+        out_path = out_path.with_suffix(".html.gz")
+        with gzip.open(out_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            stream.dump(f)
+    else:
+        with open(out_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+            stream.dump(f)
+    return out_path